@@ -1,16 +1,17 @@
 # app_streamlit.py — 极简前端：先配对预览 → 用户选C/D → 弹出结果 → 刷新轮次
 import streamlit as st
 import random
+import numpy as np
 import pandas as pd
 import altair as alt
 from pd_core import (
-    Payoffs, Action,
+    Payoffs, Action, C, D,
     build_agents_without_bay_and_with_user, Simulator
 )
 
 # ---------- 页面与样式 ----------
 st.set_page_config(page_title="Iterated Prisoner's Dilemma – USER", layout="wide", initial_sidebar_state="collapsed")
-st.markdown("""
+CSS_HTML = """
 <style>
 /* 隐藏侧边栏 */
 [data-testid="stSidebar"]{display:none;}
@@ -24,7 +25,8 @@ section[data-testid="stSidebar"] + section{margin-left:0;}
 /* 主操作区稍微紧凑些 */
 .block-container{padding-top:1.2rem;}
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(CSS_HTML)  # 纯 <style>，走 st.html 不经过 markdown 解析
 
 
 AGENT_NAME_CN = {
@@ -50,9 +52,38 @@ AGENT_NAME_CN = {
     "Majority": "张郃",
 }
 
+_CN_GET = AGENT_NAME_CN.get  # 绑定方法，省去每次调用的全局 + 属性查找
+
 def cn(name: str) -> str:
     """只改变显示，不改内部逻辑/名字"""
-    return AGENT_NAME_CN.get(name, name)
+    return _CN_GET(name, name)
+
+# 规则说明框：纯 HTML 常量
+RULES_HTML = """
+<div style='
+    background-color:#f8fafc;
+    border-left:5px solid #2563eb;
+    padding:10px 16px;
+    margin-top:10px;
+    font-size:15px;
+    color:#334155;
+'>
+<b>规则说明：</b><br>
+当你与对手同时合作 🤝 → 双方各得 <b>4 分</b>；<br>
+若你背叛 ⚔️ 而对方合作 → 你得 <b>5 分</b>，对方减 <b>1 分</b>；<br>
+若双方都背叛 ⚔️ → 各得 <b>0 分</b>；<br>
+若你合作 🤝 而对方背叛 ⚔️ → 你减 <b>1 分</b>，对方得 <b>5 分</b>。
+</div>
+"""
+
+# 动作的中文显示映射（后台逻辑仍用 'C'/'D'）
+ACTION_LABELS = {
+    Action.C.value: "合作 🤝",
+    Action.D.value: "背叛 ⚔️"
+}
+REVERSE_ACTION_LABELS = {v: k for k, v in ACTION_LABELS.items()}
+ACTION_CN = {"C": "合作", "c": "合作", "D": "背叛", "d": "背叛"}
+_ACTION_CN_GET = ACTION_CN.get
 
 # ---------- 固定默认参数（不对外展示） ----------
 DEFAULTS = dict(
@@ -83,7 +114,9 @@ def init_sim():
     sim.reset()
     st.session_state.sim = sim
     st.session_state.user = user
+    st.session_state.agents_by_name = {a.name: a for a in agents}
     st.session_state.preview_pairs = None
+    st.session_state.user_opponent = None
     st.session_state.last_flash = None
 
 if "sim" not in st.session_state:
@@ -97,10 +130,13 @@ def ensure_preview_pairs(sim: Simulator):
     """
     优先使用 sim.preview_pairs() 生成“本轮预览配对”（无副作用）并缓存。
     若无该方法，则退回使用 last_pairs（第一轮可能没有）。
-    缓存内容为 [("A","B"), ...] 的名字对。
+    缓存内容为 (cache_key, [("A","B"), ...])，cache_key = (sim.round, id(sim.last_pairs))，
+    配对未变时直接复用；同时把 USER 的对手名字缓存到 st.session_state.user_opponent。
     """
-    if st.session_state.preview_pairs is not None:
-        return st.session_state.preview_pairs
+    cache_key = (sim.round, id(sim.last_pairs))
+    cache = st.session_state.preview_pairs
+    if cache is not None and cache[0] == cache_key:
+        return cache[1]
 
     pairs = None
     # 有预览方法：最稳
@@ -118,27 +154,27 @@ def ensure_preview_pairs(sim: Simulator):
         else:
             pairs = []  # 无法预览
 
-    st.session_state.preview_pairs = pairs
+    st.session_state.preview_pairs = (cache_key, pairs)
+    st.session_state.user_opponent = next(
+        (b if a == "USER" else a for (a, b) in pairs if "USER" in (a, b)), None
+    )
     return pairs
 
-def current_opponent_for_user(preview_pairs):
-    for a, b in preview_pairs:
-        if a == "USER": return b
-        if b == "USER": return a
-    return None
+def current_opponent_for_user():
+    return st.session_state.user_opponent
+
+_EMPTY_COUNTS = {"C": 0, "D": 0}
 
-def opponent_cd_percent_global(sim: Simulator, opp_name: str):
+def opponent_cd_percent_global(counts, opp_name: str):
     """
-    读取 sim.action_counts（全局计数）计算对手 C/D 百分比。
+    根据全局计数快照 counts（即 sim.action_counts）计算对手 C/D 百分比。
     若无数据返回 (None, None)。
     """
     if not opp_name:
         return None, None
-    counts = getattr(sim, "action_counts", None)
-    if not counts or opp_name not in counts:
-        return None, None
-    c = counts[opp_name].get("C", 0)
-    d = counts[opp_name].get("D", 0)
+    # 开局前 action_counts 为空 dict，用 .get 兜底
+    cd = counts.get(opp_name, _EMPTY_COUNTS)
+    c, d = cd.get("C", 0), cd.get("D", 0)
     tot = c + d
     if tot <= 0:
         return None, None
@@ -146,64 +182,64 @@ def opponent_cd_percent_global(sim: Simulator, opp_name: str):
     d_pct = 100.0 - c_pct
     return c_pct, d_pct
 
+# 对手合作/背叛比例条的 HTML 模板（常量，渲染时只填百分比与名字）
+CDBAR_EMPTY_TPL = """
+<div class='small-muted'><b>{name}</b> 还没有历史决策数据。</div>
+<div class='bar-wrap'>
+    <span class='bar-C' style='width:0%;background:#16a34a;'></span>
+    <span class='bar-D' style='width:100%;background:#dc2626;'></span>
+</div>
+<div class='bar-labels'><span>合作: --</span><span>背叛: --</span></div>
+"""
+
+CDBAR_TPL = """
+<div style="
+    width:100%;
+    height:22px;
+    border-radius:999px;
+    overflow:hidden;
+    display:flex;
+    border:1px solid #e3e6ef;">
+    <div style="width:{c:.2f}%;background:#16a34a;"></div>
+    <div style="width:{d:.2f}%;background:#dc2626;"></div>
+</div>
+<div style="display:flex;justify-content:space-between;font-size:16px;margin-top:6px;color:#374151;">
+    <span><b style='color:#16a34a;'>合作 🤝</b>: {c:.1f}%</span>
+    <span><b style='color:#dc2626;'>背叛 ⚔️</b>: {d:.1f}%</span>
+</div>
+"""
+
 def render_cd_bar(c_pct, d_pct, opp_name):
     """显示对手合作/背叛比例条（绿色=合作，红色=背叛，加起来100%）"""
     if c_pct is None:
-        st.markdown(
-            f"<div class='small-muted'><b>{cn(opp_name)}</b> 还没有历史决策数据。</div>",
-            unsafe_allow_html=True
-        )
-        st.markdown("""
-        <div class='bar-wrap'>
-            <span class='bar-C' style='width:0%;background:#16a34a;'></span>
-            <span class='bar-D' style='width:100%;background:#dc2626;'></span>
-        </div>
-        <div class='bar-labels'><span>合作: --</span><span>背叛: --</span></div>
-        """, unsafe_allow_html=True)
+        st.markdown(CDBAR_EMPTY_TPL.format(name=cn(opp_name)), unsafe_allow_html=True)
         return
 
     # 主体：合作和背叛两段拼成 100%
-    html = f"""
-    <div style="
-        width:100%;
-        height:22px;
-        border-radius:999px;
-        overflow:hidden;
-        display:flex;
-        border:1px solid #e3e6ef;">
-        <div style="width:{c_pct:.2f}%;background:#16a34a;"></div>
-        <div style="width:{d_pct:.2f}%;background:#dc2626;"></div>
-    </div>
-    <div style="display:flex;justify-content:space-between;font-size:16px;margin-top:6px;color:#374151;">
-        <span><b style='color:#16a34a;'>合作 🤝</b>: {c_pct:.1f}%</span>
-        <span><b style='color:#dc2626;'>背叛 ⚔️</b>: {d_pct:.1f}%</span>
-    </div>
-    """
-    st.markdown(html, unsafe_allow_html=True)
+    st.markdown(CDBAR_TPL.format(c=c_pct, d=d_pct), unsafe_allow_html=True)
+
+ACTION_STR = {C: "C", D: "D"}  # 引擎的整数动作编码 -> 'C'/'D'
+_ACTION_STR_GET = ACTION_STR.get
 
 def extract_user_outcome(step_info):
     """
     从 step(info) 中抽取 USER 对局信息：
     返回: opp_name, my_action, opp_action, my_payoff
-    期望 info["pairs"] 为 [(a1, m1, a2, m2, p1, p2), ...]
-    其中 m1/m2 为 Action 或 'C'/'D'；若为枚举则显示时转字符串。
+    期望 info["by_name"] 为 {name: (opp_name, my_act, opp_act, my_payoff)}
+    其中动作为整数编码 C/D；显示时统一转成 'C'/'D' 字符串。
     """
-    if not step_info or "pairs" not in step_info:
+    if not step_info or "by_name" not in step_info:
+        return None, None, None, None
+    r = step_info["by_name"].get("USER")
+    if r is None:
         return None, None, None, None
-    for (a1, m1, a2, m2, p1, p2) in step_info["pairs"]:
-        if a1 == "USER":
-            return a2, (m1.value if hasattr(m1, "value") else str(m1)), (m2.value if hasattr(m2, "value") else str(m2)), p1
-        if a2 == "USER":
-            return a1, (m2.value if hasattr(m2, "value") else str(m2)), (m1.value if hasattr(m1, "value") else str(m1)), p2
-    return None, None, None, None
+    opp_name, my_a, opp_a, my_pay = r
+    return opp_name, _ACTION_STR_GET(my_a, my_a), _ACTION_STR_GET(opp_a, opp_a), my_pay
 
 
 def get_agent_by_name(sim: Simulator, name: str):
-    """从模拟器里根据名字拿到真正的 Agent 对象"""
-    for a in sim.agents:
-        if a.name == name:
-            return a
-    return None
+    """从模拟器里根据名字拿到真正的 Agent 对象（init_sim 时建好的名字索引）"""
+    return st.session_state.agents_by_name.get(name)
 
 def render_last_action(user_agent, opp_agent):
     """
@@ -221,13 +257,8 @@ def render_last_action(user_agent, opp_agent):
             unsafe_allow_html=True
         )
     else:
-        # 根据你前面 Action 的写法，这里兼容枚举/字符串
-        if hasattr(opp_last, "value"):
-            opp_v = opp_last.value
-        else:
-            opp_v = str(opp_last)
-
-        if opp_v.upper() == "C":
+        # 引擎内部动作为整数编码 C/D
+        if opp_last == C:
             txt = "合作 🤝"
             color = "#16a34a"
         else:
@@ -241,6 +272,169 @@ def render_last_action(user_agent, opp_agent):
         )
 
 
+# 操作思路简述（尽量精炼）
+STRATEGY_BRIEF = {
+    "TFT": "先合作；之后每轮复制对手上一次的选择，合作则合作，背叛则背叛。",
+    "gTFT0.15": "先合作；若对手背叛，会以“偶尔原谅、重建合作”为原则，再回到以牙还牙的节奏。",
+    "SG3": "先合作；一旦遭背叛，进入一段固定时长的惩罚期，惩罚结束后主动恢复合作。",
+    "ALT": "从固定一方开始；随后合作与背叛交替出现，按既定节奏反复切换。",
+    "R50": "从合作或背叛中做随机抉择；不记忆历史，始终保持不确定性。",
+    "sWSLS20": "先选一种动作；若上一轮结果理想则保持不变，否则切换动作；过程中允许少量随机扰动。",
+    "Joss10": "以合作为主；即便相互合作，也会不时加入突袭式背叛，用以打乱对手节奏。",
+    "M1": "根据上一轮的双方组合状态决定当前动作；不同状态对应不同的合作倾向。",
+    "Gradual": "先合作；首次被背叛时用轻度惩罚，再犯则加重惩罚；对方回归合作后，逐步减轻直至恢复合作。",
+    "AC": "从头到尾保持合作；不因对手背叛而改变策略。",
+    "AD": "从头到尾保持背叛；不因对手合作而改变策略。",
+    "GRIM": "先合作；一旦遭遇背叛，立刻转为永久背叛，不再恢复。",
+    "PROB": "开局以试探为主；若发现对方软弱则持续剥削，若发现强硬则转向更稳妥的应对。",
+    "sTFT": "先以试探为主；随后进入以牙还牙的节奏，对手合作就合作、背叛就背叛。",
+    "WSLS": "先选一种动作；若上一轮结果理想则继续，若不理想则在合作与背叛之间切换。",
+    "TF2T": "先合作；容忍单次背叛不还手；若对手连续背叛，才开始报复；对方回归合作后再恢复合作。",
+    "CTFT": "先合作；在存在噪声或误会时，优先尝试修复合作；确认对手持续背叛后再进入报复节奏。",
+    "Tester": "开局主动试探（偏强硬）；若对手强硬则迅速收敛、转向合作框架；若对手软弱则维持压制。",
+    "Majority": "先参考群体或历史多数；随后持续跟随“占多数的做法”，在多数立场变化时同步调整。",
+}
+
+
+def coop_rates(c, d):
+    """按智能体对齐的 C/D 计数数组 → 合作率(%)；无数据为 NaN"""
+    tot = c + d
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(tot > 0, 100.0 * c / tot, np.nan)
+
+@st.cache_data(show_spinner=False)
+def build_strategy_brief():
+    """角色策略速览表：只依赖常量，构建一次后缓存（每次取到的是副本，可放心修改）"""
+    # 用你现有的 AGENT_NAME_CN 生成展示表（排除 USER）
+    rows = []
+    for code, cn_name in AGENT_NAME_CN.items():
+        if code == "USER":
+            continue
+        rows.append({
+            "中文角色": cn_name,
+            "操作思路（简述）": STRATEGY_BRIEF.get(code, "（待补充）")
+        })
+
+    df_brief = pd.DataFrame(rows)
+
+    # 按中文角色排序
+    df_brief = df_brief.sort_values("中文角色").reset_index(drop=True)
+
+    # ✅ 添加编号列，从 1 开始
+    df_brief.index = range(1, len(df_brief) + 1)
+    df_brief.index.name = "序号"
+    return df_brief
+
+LEADERBOARD_DATA = "leaderboard"  # 图表 spec 中引用的命名数据集
+
+# 快照每点一次就变，只有同一轮内的重跑（切换选项、展开图表等）才会命中；
+# 缓存跨会话共享，限制条目数免得无限增长
+LEADERBOARD_CACHE_ENTRIES = 16
+
+@st.cache_data(show_spinner=False, max_entries=LEADERBOARD_CACHE_ENTRIES)
+def build_leaderboard(summary_tuple, counts_tuple):
+    """
+    构建排行榜数据（含中文名、合作率），按 (summary, action_counts) 快照缓存，
+    数据不变时的重跑直接复用。≤20 行的数据直接用 records，不经过 pandas。
+    返回: rows（按平均收益降序的 list[dict]）
+    """
+    # 按平均收益排序，保留所有（对平均收益数组做一次 argsort）
+    avg = np.fromiter((r[2] for r in summary_tuple), dtype=np.float64, count=len(summary_tuple))
+    order = np.argsort(-avg, kind="stable")
+
+    # ✅ 增加中文显示列
+    rows = []
+    for i in order.tolist():
+        a, t, r = summary_tuple[i]
+        rows.append({"Agent": a, "Total": t, "Avg/Round": r, "Display": _CN_GET(a, a)})
+
+    # 先把合作率算出来：从 action_counts 快照里取
+    c_map = {name: c for (name, c, _) in counts_tuple}
+    d_map = {name: d for (name, _, d) in counts_tuple}
+    c = np.array([c_map.get(row["Agent"], 0) for row in rows], dtype=np.int64)
+    d = np.array([d_map.get(row["Agent"], 0) for row in rows], dtype=np.int64)
+    for row, rate in zip(rows, coop_rates(c, d).tolist()):
+        row["CoopRate"] = rate  # 新增一列：合作率(%)
+
+    return rows
+
+# 排行榜柱状条：一行一个角色，纯 HTML/CSS，宽度按平均收益占最大值的比例
+LEADERBOARD_ROW_TPL = (
+    "<div title='{name}（{agent}）总收益 {total:.1f}' "
+    "style='display:flex;align-items:center;margin:2px 0;font-size:13px;'>"
+    "<span style='width:80px;flex:none;'>{name}</span>"
+    "<div style='flex:1;'><div style='width:{width:.1f}%;height:16px;background:{color};{extra}'></div></div>"
+    "<span style='width:56px;flex:none;margin-left:6px;text-align:right;'>{avg:.2f}</span>"
+    "</div>"
+)
+
+def render_leaderboard_bars(rows):
+    """把排好序的 rows 画成横向柱状条（USER 粉色加黑边，其余蓝色）"""
+    max_v = max((row["Avg/Round"] for row in rows), default=0.0)
+    scale = 100.0 / max_v if max_v > 0 else 0.0
+    html = "".join(
+        LEADERBOARD_ROW_TPL.format(
+            name=row["Display"],
+            agent=row["Agent"],
+            total=row["Total"],
+            avg=row["Avg/Round"],
+            width=max(0.0, row["Avg/Round"] * scale),
+            color="#f4b6c2" if row["Agent"] == "USER" else "#3b82f6",
+            extra="box-shadow:inset 0 0 0 2px black;" if row["Agent"] == "USER" else "",
+        )
+        for row in rows
+    )
+    st.markdown(html, unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def build_scatter_spec():
+    """散点图的 Vega-Lite spec（与数据无关，进程内只构建一次）"""
+    # 画散点图：x=合作率, y=平均收益, 颜色=角色
+    scatter = (
+        alt.Chart(alt.NamedData(name=LEADERBOARD_DATA))
+        .mark_circle(size=140)
+        .encode(
+            x=alt.X("CoopRate:Q", title="合作率 (%)"),
+            y=alt.Y("Avg/Round:Q", title="平均收益"),
+            color=alt.Color(
+                "Display:N",
+                legend=alt.Legend(
+                    title="",
+                    orient="top",
+                    direction="horizontal",  # ✅ 水平排列，可自动换行形成两行
+                    columns=10,  # ✅ 设大一些，自动两行显示
+                    labelFontSize=15,  # ✅ 图例字体大
+                    titleFontSize=0,  # ✅ 标题大
+                    symbolSize=90,  # ✅ 色块明显
+                    padding=5,  # ✅ 图例整体留白
+                ),
+                scale=alt.Scale(scheme="category20")  # ✅ 20种颜色方案
+            ),
+            tooltip=[
+                alt.Tooltip("Display:N", title="角色"),
+                alt.Tooltip("Agent:N", title="策略代码"),
+                alt.Tooltip("CoopRate:Q", format=".1f", title="合作率(%)"),
+                alt.Tooltip("Avg/Round:Q", format=".3f", title="平均收益"),
+            ],
+        )
+        .properties(
+            title=alt.TitleParams(
+                text="合作率 vs 平均收益",  # ✅ 图标题
+                fontSize=20,  # ✅ 标题更大
+                fontWeight="bold",  # ✅ 加粗
+                anchor="middle",  # ✅ 居中显示
+                dy=20  # ✅ 稍微上移一点，视觉更舒服
+            ),
+            width=600,  # ✅ 方形宽
+            height=600  # ✅ 方形高
+        )
+    )
+    return scatter.to_dict()
+
+def with_leaderboard_data(spec, data):
+    """在缓存的 spec 上挂载本轮数据（浅拷贝，不改动缓存对象）"""
+    return {**spec, "datasets": {LEADERBOARD_DATA: data}}
+
 col_left_pad, col_main, col_right_pad = st.columns([2, 4, 2])
 with col_left_pad:
     st.markdown("<div class='pad-col' style='border-right:1px solid #e5e7eb;'></div>", unsafe_allow_html=True)
@@ -249,18 +443,20 @@ with col_right_pad:
     st.markdown("<div class='pad-col' style='border-left:1px solid #e5e7eb;'></div>", unsafe_allow_html=True)
 with col_main:
 # ---------- 页面 ----------
+    # 本次重跑用到的数据快照：只读一次，图表与对手统计共用
+    action_counts = sim.action_counts or {}
+    summary = sim.summary()
+
+    # 标题 + 说明 + 分割线合并为一个 markdown 元素
     st.markdown(
-        "<h1 style='text-align:center; font-size:38px; font-weight:900; color:#1e293b;'>三国争霸小游戏 ⚔️</h1>",
-        unsafe_allow_html=True
-    )
-    st.markdown(
+        "<h1 style='text-align:center; font-size:38px; font-weight:900; color:#1e293b;'>三国争霸小游戏 ⚔️</h1>"
         "<p style='text-align:center; font-size:20px; color:#64748b;'>"
         "游戏说明：你扮演的是 <span style='color:#dc2626; font-weight:600;'>诸葛亮</span>，"
         "请选择你的策略，目标在第100天时的收益排在第一名🏆"
-        "</p>",
+        "</p>"
+        "<hr>",
         unsafe_allow_html=True
     )
-    st.markdown("---")
 
     # 上次结果的简短提示（若需要）
     if st.session_state.get("last_flash"):
@@ -273,62 +469,36 @@ with col_main:
     left, right = st.columns([1.3, 1.0])
 
     with left:
+        # 先生成“本轮预览配对”（第一轮也会尝试得到）
+        ensure_preview_pairs(sim)
+        opp_name = current_opponent_for_user()
+
+        if opp_name:
+            opp_html = f"<div style='font-size:26px; font-weight:700; color:#1e293b;'>匹配到的对手：<span style='color:#2563eb;'>{cn(opp_name)}</span></div>"
+        else:
+            opp_html = "<div style='font-size:22px; color:#6b7280;'>尚未匹配到对手</div>"
+
+        # 天数 + 对手 + 分割线 + 标题合并为一个 markdown 元素
         st.markdown(
             f"<h3 style='font-size26px; font-weight:700; color:#1e293b;'>"
             f"天数: <span style='color:#2563eb;'>{sim.round + 1}</span>"
-            f"</h3>",
+            f"</h3>"
+            f"{opp_html}"
+            "<hr>"
+            "<h3>请选择你的策略</h3>",
             unsafe_allow_html=True
         )
-
-        # 先生成“本轮预览配对”（第一轮也会尝试得到）
-        preview_pairs = ensure_preview_pairs(sim)
-        opp_name = current_opponent_for_user(preview_pairs)
-
-        if opp_name:
-            st.markdown(
-                f"<div style='font-size:26px; font-weight:700; color:#1e293b;'>匹配到的对手：<span style='color:#2563eb;'>{cn(opp_name)}</span></div>",
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(
-                "<div style='font-size:22px; color:#6b7280;'>尚未匹配到对手</div>",
-                unsafe_allow_html=True
-            )
-
-        st.markdown("---")  # ✅ 横线分割
-        st.markdown("### 请选择你的策略")
-        # 中文显示映射
-        action_labels = {
-            Action.C.value: "合作 🤝",
-            Action.D.value: "背叛 ⚔️"
-        }
-        # 说明：合作/背叛的得分机制
-        st.markdown("""
-        <div style='
-            background-color:#f8fafc;
-            border-left:5px solid #2563eb;
-            padding:10px 16px;
-            margin-top:10px;
-            font-size:15px;
-            color:#334155;
-        '>
-        <b>规则说明：</b><br>
-        当你与对手同时合作 🤝 → 双方各得 <b>4 分</b>；<br>
-        若你背叛 ⚔️ 而对方合作 → 你得 <b>5 分</b>，对方减 <b>1 分</b>；<br>
-        若双方都背叛 ⚔️ → 各得 <b>0 分</b>；<br>
-        若你合作 🤝 而对方背叛 ⚔️ → 你减 <b>1 分</b>，对方得 <b>5 分</b>。
-        </div>
-        """, unsafe_allow_html=True)
+        # 说明：合作/背叛的得分机制（纯 HTML 常量，走 st.html 不经过 markdown 解析）
+        st.html(RULES_HTML)
         choice_label = st.radio(
             "Your action:",
-            options=["合作 🤝", "背叛 ⚔️"],
+            options=list(ACTION_LABELS.values()),
             index=0,
             horizontal=True,
             label_visibility="collapsed"
         )
         # 反查对应的 Action（后台逻辑不变）
-        reverse_map = {v: k for k, v in action_labels.items()}
-        choice = reverse_map[choice_label]
+        choice = REVERSE_ACTION_LABELS[choice_label]
 
         # 大按钮执行本轮
         if st.button("▶ 进行这次决策", type="primary", use_container_width=False):
@@ -339,15 +509,8 @@ with col_main:
             # 弹出结果
             opp_played, my_a, opp_a, my_pay = extract_user_outcome(info)
             if opp_played is not None:
-                def translate_action(a):
-                    if a in ["C", "c"]:
-                        return "合作"
-                    elif a in ["D", "d"]:
-                        return "背叛"
-                    return str(a)
-
-                opp_a_cn = translate_action(opp_a)
-                my_a_cn = translate_action(my_a)
+                opp_a_cn = _ACTION_CN_GET(opp_a, str(opp_a))
+                my_a_cn = _ACTION_CN_GET(my_a, str(my_a))
 
                 # === 构建中文提示 ===
                 flash = f"对手 **{cn(opp_played)}** 选择了 **{opp_a_cn}**；你选择了 **{my_a_cn}** → 本轮获得 **{my_pay:.2f} 分** ⚔️"
@@ -366,7 +529,7 @@ with col_main:
         if opp_name is None:
             st.info("还没有对手.")
         else:
-            c_pct, d_pct = opponent_cd_percent_global(sim, opp_name)
+            c_pct, d_pct = opponent_cd_percent_global(action_counts, opp_name)
             render_cd_bar(c_pct, d_pct, opp_name)
 
             # 👇 新增：显示这个人上一次对我做了什么
@@ -374,8 +537,8 @@ with col_main:
             render_last_action(user, opp_agent)
 
     # Leaderboard
-    st.markdown("---")
     st.markdown(
+        "<hr>"
         f"<h3 style='font-size:26px; font-weight:800; color:#1e293b;'>"
         f"第 <span style='color:#2563eb;'>{sim.round}</span> 天 · 争霸排行榜"
         f"<span style='font-size:16px; color:#6b7280;'>（平均收益）</span>"
@@ -383,183 +546,28 @@ with col_main:
         unsafe_allow_html=True
     )
 
-    df = pd.DataFrame(sim.summary(), columns=["Agent", "Total", "Avg/Round"])
-
-    # 按平均收益排序，保留所有
-    df_plot = df.sort_values("Avg/Round", ascending=False).copy()
+    # 以 summary / action_counts 的快照作为缓存键；数据不变的重跑直接复用排行榜数据
+    summary_tuple = tuple(summary)
+    counts_tuple = tuple(sorted(
+        (k, v.get("C", 0), v.get("D", 0)) for k, v in action_counts.items()
+    ))
+    rows = build_leaderboard(summary_tuple, counts_tuple)
 
-    # ✅ 增加中文显示列
-    df_plot["Display"] = df_plot["Agent"].apply(lambda x: AGENT_NAME_CN.get(x, x))
+    render_leaderboard_bars(rows)
 
-    # 确定显示顺序
-    x_order = df_plot["Display"].tolist()
-
-    # === 主图：彩色柱状图 ===
-    bars = (
-        alt.Chart(df_plot)
-        .mark_bar()
-        .encode(
-            x=alt.X(
-                "Display:N",
-                sort=x_order,
-                title=None,
-                axis=alt.Axis(labelAngle=0, labelFontSize=11, labelLimit=200)
-            ),
-            y=alt.Y("Avg/Round:Q", title="平均收益"),
-            color=alt.Color(
-                "Display:N",
-                legend=alt.Legend(
-                    title="",
-                    orient="top",
-                    columns=10,
-                    labelFontSize=15,  # ✅ 图例字体更大
-                    titleFontSize=20,  # ✅ 图例标题也大一点
-                    symbolSize=90,  # ✅ 图例色块更明显
-                ),
-                scale=alt.Scale(scheme="category20")
-            ),
-            tooltip=[
-                alt.Tooltip("Display:N", title="人物名"),
-                alt.Tooltip("Agent:N", title="策略代码"),
-                alt.Tooltip("Avg/Round:Q", format=".3f", title="平均收益"),
-                alt.Tooltip("Total:Q", format=".1f", title="总收益")
-            ],
-        )
-        .properties(height=420, width="container")
-    )
-
-    # === 高亮 USER（诸葛亮） ===
-    user_layer = (
-        alt.Chart(df_plot[df_plot["Agent"] == "USER"])
-        .mark_bar(color="#f4b6c2", stroke="black", strokeWidth=3)
-        .encode(
-            x=alt.X("Display:N", sort=x_order),
-            y=alt.Y("Avg/Round:Q")
-        )
-    )
-
-    # === 在顶部标注数值 ===
-    labels = (
-        bars.mark_text(
-            align="center",
-            baseline="bottom",
-            dy=-3,
-            fontSize=11
-        ).encode(text=alt.Text("Avg/Round:Q", format=".2f"))
-    )
-
-    st.altair_chart(bars + user_layer + labels, use_container_width=True)
-
-
-    # 操作思路简述（尽量精炼）
-    STRATEGY_BRIEF = {
-        "TFT": "先合作；之后每轮复制对手上一次的选择，合作则合作，背叛则背叛。",
-        "gTFT0.15": "先合作；若对手背叛，会以“偶尔原谅、重建合作”为原则，再回到以牙还牙的节奏。",
-        "SG3": "先合作；一旦遭背叛，进入一段固定时长的惩罚期，惩罚结束后主动恢复合作。",
-        "ALT": "从固定一方开始；随后合作与背叛交替出现，按既定节奏反复切换。",
-        "R50": "从合作或背叛中做随机抉择；不记忆历史，始终保持不确定性。",
-        "sWSLS20": "先选一种动作；若上一轮结果理想则保持不变，否则切换动作；过程中允许少量随机扰动。",
-        "Joss10": "以合作为主；即便相互合作，也会不时加入突袭式背叛，用以打乱对手节奏。",
-        "M1": "根据上一轮的双方组合状态决定当前动作；不同状态对应不同的合作倾向。",
-        "Gradual": "先合作；首次被背叛时用轻度惩罚，再犯则加重惩罚；对方回归合作后，逐步减轻直至恢复合作。",
-        "AC": "从头到尾保持合作；不因对手背叛而改变策略。",
-        "AD": "从头到尾保持背叛；不因对手合作而改变策略。",
-        "GRIM": "先合作；一旦遭遇背叛，立刻转为永久背叛，不再恢复。",
-        "PROB": "开局以试探为主；若发现对方软弱则持续剥削，若发现强硬则转向更稳妥的应对。",
-        "sTFT": "先以试探为主；随后进入以牙还牙的节奏，对手合作就合作、背叛就背叛。",
-        "WSLS": "先选一种动作；若上一轮结果理想则继续，若不理想则在合作与背叛之间切换。",
-        "TF2T": "先合作；容忍单次背叛不还手；若对手连续背叛，才开始报复；对方回归合作后再恢复合作。",
-        "CTFT": "先合作；在存在噪声或误会时，优先尝试修复合作；确认对手持续背叛后再进入报复节奏。",
-        "Tester": "开局主动试探（偏强硬）；若对手强硬则迅速收敛、转向合作框架；若对手软弱则维持压制。",
-        "Majority": "先参考群体或历史多数；随后持续跟随“占多数的做法”，在多数立场变化时同步调整。",
-    }
-
-    # 用你现有的 AGENT_NAME_CN 生成展示表（排除 USER）
-    rows = []
-    for code, cn_name in AGENT_NAME_CN.items():
-        if code == "USER":
-            continue
-        rows.append({
-            "中文角色": cn_name,
-            "操作思路（简述）": STRATEGY_BRIEF.get(code, "（待补充）")
-        })
-
-    df_brief = pd.DataFrame(rows)
-
-    # 按中文角色排序
-    df_brief = df_brief.sort_values("中文角色").reset_index(drop=True)
-
-    # ✅ 添加编号列，从 1 开始
-    df_brief.index = range(1, len(df_brief) + 1)
-    df_brief.index.name = "序号"
 
     st.markdown("<hr style='border: 1px solid #e5e7eb; margin: 1rem 0;'>", unsafe_allow_html=True)
     with st.expander("📜 角色策略速览（点击展开）", expanded=False):
         st.dataframe(
-            df_brief,
+            build_strategy_brief(),
             use_container_width=True,
             height=360
         )
 
     # ===== 下面是新增的可视化 & 下载功能 =====
 
-    # 1) 先把合作率算出来：从 sim.action_counts 里取
-    coop_rows = []
-    action_counts = getattr(sim, "action_counts", {})
-    for agent_name in df_plot["Agent"]:
-        counts = action_counts.get(agent_name, {})
-        c = counts.get("C", 0)
-        d = counts.get("D", 0)
-        tot = c + d
-        if tot > 0:
-            coop_rate = 100.0 * c / tot  # 转百分比
-        else:
-            coop_rate = None
-        coop_rows.append(coop_rate)
-
-    df_plot["CoopRate"] = coop_rows  # 新增一列：合作率(%)
-
-    # 2) 画散点图：x=合作率, y=平均收益, 颜色=角色
-    scatter = (
-        alt.Chart(df_plot)
-        .mark_circle(size=140)
-        .encode(
-            x=alt.X("CoopRate:Q", title="合作率 (%)"),
-            y=alt.Y("Avg/Round:Q", title="平均收益"),
-            color=alt.Color(
-                "Display:N",
-                legend=alt.Legend(
-                    title="",
-                    orient="top",
-                    direction="horizontal",  # ✅ 水平排列，可自动换行形成两行
-                    columns=10,  # ✅ 设大一些，自动两行显示
-                    labelFontSize=15,  # ✅ 图例字体大
-                    titleFontSize=0,  # ✅ 标题大
-                    symbolSize=90,  # ✅ 色块明显
-                    padding=5,  # ✅ 图例整体留白
-                ),
-                scale=alt.Scale(scheme="category20")  # ✅ 20种颜色方案
-            ),
-            tooltip=[
-                alt.Tooltip("Display:N", title="角色"),
-                alt.Tooltip("Agent:N", title="策略代码"),
-                alt.Tooltip("CoopRate:Q", format=".1f", title="合作率(%)"),
-                alt.Tooltip("Avg/Round:Q", format=".3f", title="平均收益"),
-            ],
-        )
-        .properties(
-            title=alt.TitleParams(
-                text="合作率 vs 平均收益",  # ✅ 图标题
-                fontSize=20,  # ✅ 标题更大
-                fontWeight="bold",  # ✅ 加粗
-                anchor="middle",  # ✅ 居中显示
-                dy=20  # ✅ 稍微上移一点，视觉更舒服
-            ),
-            width=600,  # ✅ 方形宽
-            height=600  # ✅ 方形高
-        )
-    )
-
-    st.altair_chart(scatter, use_container_width=True)
+    # 大尺寸散点图默认折叠，专心对局时不占渲染开销
+    with st.expander("📊 合作率 vs 平均收益 散点图（点击展开）", expanded=False):
+        st.vega_lite_chart(with_leaderboard_data(build_scatter_spec(), rows), use_container_width=True)
 
 
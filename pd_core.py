@@ -1,431 +1,530 @@
 # pd_core.py
 from __future__ import annotations
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from enum import Enum
 from typing import Dict, List, Tuple, Optional, Any
-import random
-import statistics
-from collections import defaultdict
+import numpy as np
 # ========== Core primitives ==========
 
+# 内部动作编码：热路径（decide/observe/payoff）全部用 int 比较
+C, D = 0, 1
+
 class Action(str, Enum):
+    """仅用于 UI 边界的动作表示；引擎内部用 C/D 整数"""
     C = "C"
     D = "D"
 
-@dataclass
+ACTIONS = (Action.C, Action.D)                     # 整数编码 -> Action
+ACTION_CODE = {Action.C: C, Action.D: D}           # Action（或 'C'/'D'）-> 整数编码
+
+def to_code(a) -> int:
+    """把 Action / 'C' / 'D' / 0 / 1 统一成整数编码"""
+    return a if isinstance(a, int) else ACTION_CODE[a]
+
+@dataclass(frozen=True)
 class Payoffs:
+    """收益参数（不可变：_flat 与 Simulator 里的收益表都是构造时的快照）"""
     T: int = 5  # Temptation: D vs C
     R: int = 3  # Reward:     C vs C
     P: int = 1  # Punishment: D vs D
     S: int = 0  # Sucker:     C vs D
-    def payoff(self, a_self: Action, a_opp: Action) -> int:
-        if a_self == Action.C and a_opp == Action.C: return self.R
-        if a_self == Action.C and a_opp == Action.D: return self.S
-        if a_self == Action.D and a_opp == Action.C: return self.T
-        return self.P
+    def __post_init__(self):
+        # 按 (我方 << 1) | 对方 展平：CC, CD, DC, DD
+        object.__setattr__(self, "_flat", (self.R, self.S, self.T, self.P))
+    def payoff(self, a_self: int, a_opp: int) -> int:
+        return self._flat[(a_self << 1) | a_opp]
 
-@dataclass
+@dataclass(slots=True)
 class DyadHistory:
-    my_actions:  List[Action] = field(default_factory=list)
-    opp_actions: List[Action] = field(default_factory=list)
-    my_payoffs:  List[int]    = field(default_factory=list)
+    """与某个对手的对局记忆：只保留标量槽位（最近两轮 + 累计计数），不存完整序列"""
+    n:        int = 0   # 已交手轮数
+    last_my:  int = -1  # 上一轮我方动作（-1 = 尚无历史）
+    last_opp: int = -1  # 上一轮对方动作（-1 = 尚无历史）
+    last_pay: int = 0   # 上一轮我方收益
+    prev_opp: int = -1  # 上上轮对方动作（-1 = 尚无）
+    opp_C_count: int = 0       # 对方累计合作次数（Majority 用）
+    opp_D_seen:  bool = False  # 对方是否背叛过（GrimTrigger 用）
+
+class _Unbound:
+    """Agent 加入 Simulator 之前的逐对手状态 / 随机数占位：一读就报明确的错，而不是 IndexError"""
+    __slots__ = ()
+    def __getitem__(self, i):
+        raise RuntimeError("Agent 尚未加入 Simulator：逐对手状态与每轮随机数由 Simulator 构造时分配")
+
+_UNBOUND = _Unbound()
 
 class Agent:
+    __slots__ = ("name", "id", "score", "memory", "u")
     def __init__(self, name: str):
         self.name   = name
+        self.id     = -1  # 在模拟器中的下标（由 Simulator 分配）
         self.score  = 0
-        self.memory: Dict[str, DyadHistory] = {}
-    def _ensure(self, opp: "Agent"):
-        if opp.name not in self.memory:
-            self.memory[opp.name] = DyadHistory()
-    def last_with(self, opp: "Agent") -> Tuple[Optional[Action], Optional[Action], Optional[int]]:
-        if opp.name not in self.memory or not self.memory[opp.name].my_actions:
+        self.memory: List[DyadHistory] = _UNBOUND  # 按对手 Agent.id 索引（由 init_state 分配）
+        self.u: List[float] = _UNBOUND  # 本轮均匀随机数，概率型策略读 u[self.id]（由 Simulator 每轮就地刷新）
+    def init_state(self, n: int):
+        """按参赛人数 n 预分配逐对手状态（Simulator 构造与 reset 时调用）；子类在此追加自己的逐对手数组"""
+        self.memory = [DyadHistory() for _ in range(n)]
+    def _last_opp(self, opp: "Agent") -> int:
+        """对方上一步动作；尚无历史时为 -1（多数策略只看这一项，免去 last_with 的元组）"""
+        return self.memory[opp.id].last_opp
+    def last_with(self, opp: "Agent") -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        h = self.memory[opp.id]
+        if not h.n:
             return None, None, None
-        h = self.memory[opp.name]
-        return h.my_actions[-1], h.opp_actions[-1], h.my_payoffs[-1]
-    def decide(self, opp: "Agent") -> Action:
+        return h.last_my, h.last_opp, h.last_pay
+    def decide(self, opp: "Agent") -> int:
         raise NotImplementedError
-    def observe(self, opp: "Agent", my_action: Action, opp_action: Action, my_payoff: int):
-        self._ensure(opp)
-        h = self.memory[opp.name]
-        h.my_actions.append(my_action)
-        h.opp_actions.append(opp_action)
-        h.my_payoffs.append(my_payoff)
+    def observe(self, opp: "Agent", my_action: int, opp_action: int, my_payoff: int):
+        h = self.memory[opp.id]
+        h.prev_opp = h.last_opp
+        h.last_my, h.last_opp, h.last_pay = my_action, opp_action, my_payoff
+        h.n += 1
+        if opp_action == C:
+            h.opp_C_count += 1
+        else:
+            h.opp_D_seen = True
         self.score += my_payoff
 
 # ========== 19 固定/概率/互惠策略（与你之前一致；删除了 BAY） ==========
 
+# Prober / Tester 的逐对手模式与转移表（C/D 为 0/1，可直接作下标）
+PROBE, RETALIATE, EXPLOIT = 0, 1, 2      # 试探 / 以牙还牙 / 剥削
+PROBE_EXIT  = (EXPLOIT, RETALIATE)       # [试探期对方是否背叛过] -> 下一模式
+MODE_ACTION = ((C, D), (C, D), (D, D))   # [模式][对方上一步] -> 动作（PROBE 行仅占位）
+
 class AlwaysCooperate(Agent):
-    def decide(self, opp: "Agent") -> Action: return Action.C
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int: return C
 
 class AlwaysDefect(Agent):
-    def decide(self, opp: "Agent") -> Action: return Action.D
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int: return D
 
 class TitForTat(Agent):
-    def decide(self, opp: "Agent") -> Action:
-        _, opp_last, _ = self.last_with(opp)
-        return Action.C if opp_last is None else opp_last
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
+        opp_last = self._last_opp(opp)
+        return C if opp_last < 0 else opp_last
 
 class WinStayLoseShift(Agent):
-    def decide(self, opp: "Agent") -> Action:
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
         my_last, opp_last, _ = self.last_with(opp)
-        if my_last is None: return Action.C
-        good = (my_last == Action.C and opp_last == Action.C) or (my_last == Action.D and opp_last == Action.C)
-        return my_last if good else (Action.C if my_last == Action.D else Action.D)
+        if my_last is None: return C
+        good = (my_last == C and opp_last == C) or (my_last == D and opp_last == C)
+        return my_last if good else (C if my_last == D else D)
 
 class GrimTrigger(Agent):
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        if Action.D in self.memory[opp.name].opp_actions:
-            return Action.D
-        return Action.C
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
+        if self.memory[opp.id].opp_D_seen:
+            return D
+        return C
 
 class TitForTwoTats(Agent):
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        h = self.memory[opp.name]
-        if len(h.opp_actions) < 2: return Action.C
-        return Action.D if (h.opp_actions[-1] == Action.D and h.opp_actions[-2] == Action.D) else Action.C
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
+        h = self.memory[opp.id]
+        if h.n < 2: return C
+        return D if (h.last_opp == D and h.prev_opp == D) else C
 
 class SuspiciousTitForTat(Agent):
-    def decide(self, opp: "Agent") -> Action:
-        _, opp_last, _ = self.last_with(opp)
-        return Action.D if opp_last is None else opp_last
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
+        opp_last = self._last_opp(opp)
+        return D if opp_last < 0 else opp_last
 
 class GenerousTitForTat(Agent):
+    __slots__ = ("generosity",)
     def __init__(self, name: str, generosity: float = 0.1):
         super().__init__(name); self.generosity = max(0.0, min(1.0, generosity))
-    def decide(self, opp: "Agent") -> Action:
-        _, opp_last, _ = self.last_with(opp)
-        if opp_last is None or opp_last == Action.C: return Action.C
-        return Action.C if random.random() < self.generosity else Action.D
+    def decide(self, opp: "Agent") -> int:
+        if self._last_opp(opp) != D: return C  # 首轮或对方上轮合作
+        return C if self.u[self.id] < self.generosity else D
 
 class SoftGrudger(Agent):
+    __slots__ = ("punish_rounds", "_punish_left")
     def __init__(self, name: str, punish_rounds: int = 2):
-        super().__init__(name); self.punish_rounds = max(1, punish_rounds); self._punish_left: Dict[str, int] = {}
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        if self._punish_left.get(opp.name, 0) > 0:
-            self._punish_left[opp.name] -= 1; return Action.D
-        _, opp_last, _ = self.last_with(opp)
-        if opp_last == Action.D:
-            self._punish_left[opp.name] = self.punish_rounds - 1
-            return Action.D
-        return Action.C
+        super().__init__(name); self.punish_rounds = max(1, punish_rounds); self._punish_left: List[int] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n); self._punish_left = [0] * n
+    def decide(self, opp: "Agent") -> int:
+        j = opp.id
+        if self._punish_left[j] > 0:
+            self._punish_left[j] -= 1; return D
+        if self._last_opp(opp) == D:
+            self._punish_left[j] = self.punish_rounds - 1
+            return D
+        return C
 
 class Alternator(Agent):
+    __slots__ = ("start_with_C", "_next")
     def __init__(self, name: str, start_with_C: bool = True):
-        super().__init__(name); self.start_with_C = bool(start_with_C); self._count: Dict[str, int] = {}
-    def decide(self, opp: "Agent") -> Action:
-        n = self._count.get(opp.name, 0); self._count[opp.name] = n + 1
-        want_C = (n % 2 == 0) if self.start_with_C else (n % 2 == 1)
-        return Action.C if want_C else Action.D
+        super().__init__(name); self.start_with_C = bool(start_with_C); self._next: List[int] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n); self._next = [C if self.start_with_C else D] * n  # 对每个对手的下一步动作
+    def decide(self, opp: "Agent") -> int:
+        a = self._next[opp.id]; self._next[opp.id] = a ^ 1  # C/D 为 0/1，异或 1 即交替
+        return a
 
 class RandomCooperator(Agent):
+    __slots__ = ("p",)
     def __init__(self, name: str, coop_prob: float = 0.5):
         super().__init__(name); self.p = max(0.0, min(1.0, coop_prob))
-    def decide(self, opp: "Agent") -> Action:
-        return Action.C if random.random() < self.p else Action.D
+    def decide(self, opp: "Agent") -> int:
+        return C if self.u[self.id] < self.p else D
 
 class Prober(Agent):
+    __slots__ = ("_mode",)
+    OPENING = (D, C, C)  # 试探期前三步
     def __init__(self, name: str):
-        super().__init__(name); self._mode: Dict[str, str] = {}
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        h = self.memory[opp.name]; mode = self._mode.get(opp.name, "probe")
-        if mode == "probe":
-            t = len(h.my_actions)
-            if t == 0: return Action.D
-            if t in (1, 2): return Action.C
-            retaliated = Action.D in h.opp_actions[1:3]
-            self._mode[opp.name] = "tft" if retaliated else "exploit"
-            return self.decide(opp)
-        if mode == "tft":
-            _, opp_last, _ = self.last_with(opp)
-            return Action.C if opp_last is None else opp_last
-        return Action.D
+        super().__init__(name); self._mode: List[int] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n); self._mode = [PROBE] * n
+    def decide(self, opp: "Agent") -> int:
+        h = self.memory[opp.id]; mode = self._mode[opp.id]
+        if mode == PROBE:
+            if h.n < 3: return self.OPENING[h.n]
+            # 第 4 步：看对方第 2、3 步（即上两轮）是否还过手
+            mode = self._mode[opp.id] = PROBE_EXIT[h.prev_opp | h.last_opp]
+        return MODE_ACTION[mode][h.last_opp]
 
 class StochasticWSLS(Agent):
+    __slots__ = ("eps",)
     def __init__(self, name: str, epsilon: float = 0.2):
         super().__init__(name); self.eps = max(0.0, min(1.0, epsilon))
-    def decide(self, opp: "Agent") -> Action:
+    def decide(self, opp: "Agent") -> int:
         my_last, opp_last, _ = self.last_with(opp)
-        if my_last is None: return Action.C
-        won = (my_last == Action.C and opp_last == Action.C) or (my_last == Action.D and opp_last == Action.C)
+        if my_last is None: return C
+        won = (my_last == C and opp_last == C) or (my_last == D and opp_last == C)
         if won: return my_last
-        return (Action.C if my_last == Action.D else Action.D) if random.random() < self.eps else my_last
+        return (C if my_last == D else D) if self.u[self.id] < self.eps else my_last
 
 class Joss(Agent):
+    __slots__ = ("p",)
     def __init__(self, name: str, p_defect_after_CC: float = 0.1):
         super().__init__(name); self.p = max(0.0, min(1.0, p_defect_after_CC))
-    def decide(self, opp: "Agent") -> Action:
-        _, opp_last, _ = self.last_with(opp)
-        if opp_last is None: return Action.C
-        if opp_last == Action.C: return Action.D if random.random() < self.p else Action.C
-        return Action.D
+    def decide(self, opp: "Agent") -> int:
+        opp_last = self._last_opp(opp)
+        if opp_last < 0: return C
+        if opp_last == C: return D if self.u[self.id] < self.p else C
+        return D
 
 class ContriteTitForTat(Agent):
+    __slots__ = ("contrite",)
     def __init__(self, name: str):
-        super().__init__(name); self.contrite: Dict[str, bool] = {}
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        self.contrite.setdefault(opp.name, False)
+        super().__init__(name); self.contrite: List[bool] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n); self.contrite = [False] * n
+    def decide(self, opp: "Agent") -> int:
+        j = opp.id
         my_last, opp_last, _ = self.last_with(opp)
-        if opp_last is None: return Action.C
-        if my_last == Action.D and opp_last == Action.C: self.contrite[opp.name] = True
-        if self.contrite[opp.name]:
-            self.contrite[opp.name] = False; return Action.C
+        if opp_last is None: return C
+        if my_last == D and opp_last == C: self.contrite[j] = True
+        if self.contrite[j]:
+            self.contrite[j] = False; return C
         return opp_last
 
 class Gradual(Agent):
+    __slots__ = ("punish_count", "remaining", "repairing")
     def __init__(self, name: str):
         super().__init__(name)
-        self.punish_count: Dict[str, int] = {}
-        self.remaining:    Dict[str, int] = {}
-        self.repairing:    Dict[str, int] = {}
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        self.punish_count.setdefault(opp.name, 0)
-        self.remaining.setdefault(opp.name, 0)
-        self.repairing.setdefault(opp.name, 0)
-        if self.remaining[opp.name] > 0:
-            self.remaining[opp.name] -= 1
-            if self.remaining[opp.name] == 0: self.repairing[opp.name] = 2
-            return Action.D
-        if self.repairing[opp.name] > 0:
-            self.repairing[opp.name] -= 1; return Action.C
-        _, opp_last, _ = self.last_with(opp)
-        if opp_last == Action.D:
-            self.punish_count[opp.name] += 1
-            self.remaining[opp.name] = self.punish_count[opp.name]
-            return Action.D
-        return Action.C
+        self.punish_count: List[int] = _UNBOUND
+        self.remaining:    List[int] = _UNBOUND
+        self.repairing:    List[int] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n)
+        self.punish_count = [0] * n
+        self.remaining    = [0] * n
+        self.repairing    = [0] * n
+    def decide(self, opp: "Agent") -> int:
+        j = opp.id
+        if self.remaining[j] > 0:
+            self.remaining[j] -= 1
+            if self.remaining[j] == 0: self.repairing[j] = 2
+            return D
+        if self.repairing[j] > 0:
+            self.repairing[j] -= 1; return C
+        if self._last_opp(opp) == D:
+            self.punish_count[j] += 1
+            self.remaining[j] = self.punish_count[j]
+            return D
+        return C
 
 class Tester(Agent):
+    __slots__ = ("mode",)
     def __init__(self, name: str):
-        super().__init__(name); self.mode: Dict[str, str] = {}
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp)
-        mode = self.mode.get(opp.name, "probe"); h = self.memory[opp.name]
-        if mode == "probe":
-            if len(h.my_actions) == 0: return Action.D
-            opp_last = h.opp_actions[-1]
-            self.mode[opp.name] = "tft" if opp_last == Action.D else "exploit"
-            return self.decide(opp)
-        if mode == "tft":
-            _, opp_last, _ = self.last_with(opp)
-            return Action.C if opp_last is None else opp_last
-        return Action.D
+        super().__init__(name); self.mode: List[int] = _UNBOUND
+    def init_state(self, n: int):
+        super().init_state(n); self.mode = [PROBE] * n
+    def decide(self, opp: "Agent") -> int:
+        mode = self.mode[opp.id]; h = self.memory[opp.id]
+        if mode == PROBE:
+            if h.n == 0: return D
+            mode = self.mode[opp.id] = PROBE_EXIT[h.last_opp]
+        return MODE_ACTION[mode][h.last_opp]
 
 class Majority(Agent):
-    def decide(self, opp: "Agent") -> Action:
-        self._ensure(opp); h = self.memory[opp.name]
-        if not h.opp_actions: return Action.C
-        return Action.C if h.opp_actions.count(Action.C)/len(h.opp_actions) >= 0.5 else Action.D
+    __slots__ = ()
+    def decide(self, opp: "Agent") -> int:
+        h = self.memory[opp.id]
+        return C if 2 * h.opp_C_count >= h.n else D
 
 class MemoryOne(Agent):
+    __slots__ = ("p",)
     def __init__(self, name: str, pCC: float, pCD: float, pDC: float, pDD: float):
         super().__init__(name)
         clip = lambda x: max(0.0, min(1.0, float(x)))
-        self.p = {
-            (Action.C, Action.C): clip(pCC),
-            (Action.C, Action.D): clip(pCD),
-            (Action.D, Action.C): clip(pDC),
-            (Action.D, Action.D): clip(pDD),
-        }
-    def decide(self, opp: "Agent") -> Action:
-        my_last, opp_last, _ = self.last_with(opp)
-        if opp_last is None:
-            return Action.C if random.random() < self.p[(Action.C, Action.C)] else Action.D
-        probC = self.p[(my_last, opp_last)]
-        return Action.C if random.random() < probC else Action.D
+        # 按 (my_last << 1) | opp_last 展平：CC, CD, DC, DD
+        self.p = (clip(pCC), clip(pCD), clip(pDC), clip(pDD))
+    def decide(self, opp: "Agent") -> int:
+        h = self.memory[opp.id]
+        idx = (h.last_my << 1) | h.last_opp if h.n else 0  # 首轮按 CC 处理
+        return C if self.u[self.id] < self.p[idx] else D
 
 # ========== USER 策略（由外部设置 next_action） ==========
 
 class UserAgent(Agent):
     """交互式用户策略：每轮从外部注入 next_action（C/D），若未设置则默认 C。"""
+    __slots__ = ("next_action",)
     def __init__(self, name: str = "USER"):
         super().__init__(name)
         self.next_action: Optional[Action] = None
-    def decide(self, opp: "Agent") -> Action:
-        return self.next_action if self.next_action is not None else Action.C
+    def decide(self, opp: "Agent") -> int:
+        return to_code(self.next_action) if self.next_action is not None else C
 
 # ========== Engine（按步推进的模拟器） ==========
 
-def _make_random_pairs(agents, rng):
-    pool = list(agents)
-    rng.shuffle(pool)  # 使用传入的 rng
-    return [(pool[i], pool[i+1]) for i in range(0, len(pool) - 1, 2)]
-
-def _play_pair_with_override(a1: Agent, a2: Agent, pay: Payoffs,
-                             overrides: Optional[Dict[str, Action]] = None) -> Tuple[Action, Action, int, int]:
-    if overrides and a1.name in overrides:
-        m1 = overrides[a1.name]
-    else:
-        m1 = a1.decide(a2)
-    if overrides and a2.name in overrides:
-        m2 = overrides[a2.name]
-    else:
-        m2 = a2.decide(a1)
-    p1 = pay.payoff(m1, m2); p2 = pay.payoff(m2, m1)
-    a1.observe(a2, m1, m2, p1); a2.observe(a1, m2, m1, p2)
-    return m1, m2, p1, p2
+def _make_random_pairs(perm: np.ndarray, rng: np.random.Generator) -> Tuple[List[int], List[int]]:
+    """就地打乱下标排列 perm（Fisher–Yates），按 (perm[2k], perm[2k+1]) 两两配对，返回两侧下标列表"""
+    rng.shuffle(perm)  # 使用传入的 rng
+    return perm[0::2].tolist(), perm[1::2].tolist()
 
 class Simulator:
-    """支持 δ 的逐轮推进，支持对特定代理（USER）注入动作 overrides。"""
-    def __init__(self, agents: List[Agent], pay: Payoffs, seed: int = 0, delta: float = 0.0):
+    """
+    支持 δ 的逐轮推进，支持对特定代理（USER）注入动作 overrides。
+    逐智能体的数值状态按 Agent.id 存成并行列表（cumsum / C_count / D_count）：每轮先收集全部动作，
+    再逐对查收益表、累加到 cumsum；逐轮曲线存在预分配的 NumPy 数组里。
+    """
+    def __init__(self, agents: List[Agent], pay: Payoffs, seed: int = 0, delta: float = 0.0,
+                 max_rounds: int = 256):
         assert len(agents) % 2 == 0, "Agents count must be even."
         self.agents = agents
+        for i, a in enumerate(agents):
+            a.id = i
+            a.init_state(len(agents))
+        # 策略分派表：按 id 预先取好绑定方法，热路径里免去每次的属性查找与绑定
+        self._u = [0.0] * (len(agents) + 1)  # 每轮的均匀随机数：[Agent.id] 给概率型策略，[-1] 给配对复用判定
+        for a in agents:
+            a.u = self._u
+        self._names = [a.name for a in agents]
+        self._index = {a.name: a.id for a in agents}
+        self._pair_names = (None, [], [])  # (配对列表, 左侧名字, 右侧名字)，见 _round_info
+        self._no_force = [-1] * len(agents)
+        self._forced = list(self._no_force)  # 按 id 的强制动作（-1 = 不强制），由 step 按 overrides 临时填写
+        self._decide = [a.decide for a in agents]
+        self._observe = [a.observe for a in agents]
         self.pay = pay
+        self._pay_flat = pay._flat  # [(我方动作 << 1) | 对方动作] -> 收益
         self.delta = max(0.0, min(1.0, float(delta)))
-        self.rng = random.Random(seed)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self._perm = np.arange(len(agents), dtype=np.intp)  # 常驻的下标排列，每轮就地洗牌
+        self._pair_i: List[int] = []; self._pair_j: List[int] = []  # 上一轮配对（下标）
         self.round = 0
         self.last_pairs: List[Tuple[Agent, Agent]] = []
-        self.coop_rates: List[float] = []
-        self.per_agent_cumsum: Dict[str, int] = {a.name: 0 for a in agents}
-        self.per_agent_cumavg: Dict[str, List[float]] = {a.name: [] for a in agents}
-        self.per_round_avg_all: List[float] = []
-        self.action_counts = defaultdict(lambda: {"C": 0, "D": 0})
+        self.cumsum = [0] * len(agents)  # 按 Agent.id 的累计收益
+        # 逐轮曲线预分配成数组（列 = 轮次），写满后按倍数扩容；对外通过 cumavg / coop_rates 等视图读取
+        self._cap = max(1, int(max_rounds))
+        self._cumavg = np.empty((len(agents), self._cap), dtype=np.float64)
+        self._coop_rates = np.empty(self._cap, dtype=np.float64)
+        self._round_avg = np.empty(self._cap, dtype=np.float64)
+        # 全局 C/D 计数（按 Agent.id），对外通过 action_counts 属性以 {name: {"C", "D"}} 形式读取
+        self.C_count = [0] * len(agents)
+        self.D_count = [0] * len(agents)
+        self._draw_next_round()
 
     def reset(self):
-        self.round = 0; self.last_pairs = []; self.action_counts.clear()
-        self.coop_rates = []
-        self.per_round_avg_all = []
-        self.per_agent_cumsum = {a.name: 0 for a in self.agents}
-        self.per_agent_cumavg = {a.name: [] for a in self.agents}
+        """回到开局：随机流、配对排列与各项计数都恢复到刚构造时的状态（同一 seed 重放同一局）"""
+        self.round = 0; self.last_pairs = []
+        self.C_count = [0] * len(self.agents); self.D_count = [0] * len(self.agents)
+        self.rng = np.random.default_rng(self.seed)
+        self._perm = np.arange(len(self.agents), dtype=np.intp)
+        self._pair_i = []; self._pair_j = []
+        self._pair_names = (None, [], [])
+        self.cumsum = [0] * len(self.agents)
         for a in self.agents:
-            a.score = 0; a.memory.clear()
+            a.score = 0; a.init_state(len(self.agents))
+        self._draw_next_round()
 
     def step(self, overrides: Optional[Dict[str, Action]] = None) -> Dict[str, Any]:
         """推进一轮；如提供 overrides={'USER': Action.C} 则强制 USER 的动作。返回本轮信息。"""
+        return self._round_info(*self._play_round(overrides))
+
+    def run(self, n_rounds: int, record_every: int = 0,
+            overrides: Optional[Dict[str, Action]] = None) -> List[Dict[str, Any]]:
+        """
+        连续推进 n_rounds 轮（批量模拟用）。得分、C/D 计数与逐轮曲线照常更新，
+        但只有每 record_every 轮才组装一次 step() 那样的本轮信息（0 = 一份都不组装）。
+        返回组装出的本轮信息列表。
+        """
+        records = []
+        for _ in range(n_rounds):
+            played = self._play_round(overrides)
+            if record_every and self.round % record_every == 0:
+                records.append(self._round_info(*played))
+        return records
+
+    def _play_round(self, overrides: Optional[Dict[str, Action]]):
+        """一轮的全部状态推进；返回组装本轮信息所需的逐对列表与汇总值"""
         # 维持你原本“先自增”的设计（前端若想马上刷新轮次，请在点击后 st.rerun()）
         self.round += 1
 
-        # 复用上轮配对（以 δ 概率）或随机重配
-        if self.last_pairs and self.rng.random() < self.delta:
-            pairs = self.last_pairs
+        # 本轮的随机数与配对已在上一轮末尾抽好（见 _draw_next_round）
+        self._u[:] = self._next_u  # 就地刷新，各策略持有的是同一个列表
+        pairs, ii, jj = self._next_pairs
+
+        # —— 1) 决策：各策略只有一个实例、逻辑各异，按下标逐个调用 decide 收集动作 —— #
+        # 每人每轮只决策一次、只读写自己的状态，两侧分开收集与逐对交替调用等价
+        decide, agents = self._decide, self.agents
+        if not overrides:
+            # 常见情况（无强制动作）：循环里不做任何 override 判断
+            m_i = [decide[i](agents[j]) for i, j in zip(ii, jj)]
+            m_j = [decide[j](agents[i]) for i, j in zip(ii, jj)]
         else:
-            pairs = _make_random_pairs(self.agents, self.rng)
-
-        coop_count = 0
-        interactions = 0
-        round_sum = 0
-        results = []  # [(a1.name, act1, a2.name, act2, p1, p2)]
-
-        for a, b in pairs:
-            m1, m2, p1, p2 = _play_pair_with_override(a, b, self.pay, overrides)
-
-            # —— 累计合作次数、交互计数、总收益 —— #
-            coop_count += (1 if m1 == Action.C else 0) + (1 if m2 == Action.C else 0)
-            interactions += 2
-            round_sum += (p1 + p2)
-
-            # —— 累计每个智能体的累计收益（你原来的逻辑） —— #
-            self.per_agent_cumsum[a.name] += p1
-            self.per_agent_cumsum[b.name] += p2
-
-            # —— 新增：全局 C/D 计数（用于右侧“全局历史百分比”） —— #
-            # m1/m2 可能是枚举，转为 'C'/'D' 键
-            k1 = 'C' if m1 == Action.C else 'D'
-            k2 = 'C' if m2 == Action.C else 'D'
-            self.action_counts[a.name][k1] += 1
-            self.action_counts[b.name][k2] += 1
-
-            # —— 记录本轮对局详情，用于前端弹窗 —— #
-            # 若你更喜欢把动作存成字符串，可改成 k1/k2
-            results.append((a.name, m1, b.name, m2, p1, p2))
+            # overrides 先落到按 id 的 forced 表（-1 = 不强制），循环里只做一次列表读取
+            forced = self._forced
+            for name, act in overrides.items():
+                k = self._index.get(name)
+                if k is not None:
+                    forced[k] = to_code(act)
+            m_i = [f if (f := forced[i]) >= 0 else decide[i](agents[j]) for i, j in zip(ii, jj)]
+            m_j = [f if (f := forced[j]) >= 0 else decide[j](agents[i]) for i, j in zip(ii, jj)]
+            forced[:] = self._no_force
+        # —— 2) 收益：查展平收益表 —— #
+        flat = self._pay_flat
+        q_i = [flat[(m1 << 1) | m2] for m1, m2 in zip(m_i, m_j)]
+        q_j = [flat[(m2 << 1) | m1] for m1, m2 in zip(m_i, m_j)]
+
+        # —— 3) 累计收益、全局 C/D 计数（用于右侧“全局历史百分比”）与记忆回写：一次逐对循环 —— #
+        # 每轮只有 N/2 对（app 里 10 对），这个规模下标量循环比 NumPy 小数组运算更快
+        cumsum, c_cnt, d_cnt, observe = self.cumsum, self.C_count, self.D_count, self._observe
+        for i, j, m1, m2, p1, p2 in zip(ii, jj, m_i, m_j, q_i, q_j):
+            cumsum[i] += p1; cumsum[j] += p2
+            d_cnt[i] += m1; d_cnt[j] += m2  # C=0 / D=1，动作本身就是 D 的增量
+            c_cnt[i] += 1 - m1; c_cnt[j] += 1 - m2
+            observe[i](agents[j], m1, m2, p1); observe[j](agents[i], m2, m1, p2)
+
+        # —— 4) 合作次数、交互计数、总收益（C=0，合作数 = 人次 - 动作之和） —— #
+        interactions = 2 * len(ii)
+        coop_count = interactions - sum(m_i) - sum(m_j)
+        round_sum = sum(q_i) + sum(q_j)
 
         # —— 汇总指标（你原来的逻辑） —— #
         rate = (coop_count / interactions) if interactions else 0.0
-        self.coop_rates.append(rate)
-        self.per_round_avg_all.append(round_sum / len(self.agents))
+        r = self.round - 1  # 本轮在曲线数组中的列
+        if r >= self._cap:
+            self._grow()
+        self._coop_rates[r] = rate
+        self._round_avg[r] = round_sum / len(self.agents)
 
-        # 这里 self.round 已加 1，作为分母可以直接用（与你原实现一致）
-        for a in self.agents:
-            self.per_agent_cumavg[a.name].append(self.per_agent_cumsum[a.name] / self.round)
+        # 这里 self.round 已加 1，作为分母可以直接用（与你原实现一致）；整列一次写入
+        np.divide(self.cumsum, self.round, out=self._cumavg[:, r])
 
-        # 记录“上一轮配对”
+        # 记录“上一轮配对”，并提前抽好下一轮
         self.last_pairs = pairs
+        self._pair_i, self._pair_j = ii, jj
+        self._draw_next_round()
+
+        return ii, jj, m_i, m_j, q_i, q_j, rate, round_sum / len(self.agents)
+
+    def _round_info(self, ii, jj, m_i, m_j, q_i, q_j, rate: float, round_avg: float) -> Dict[str, Any]:
+        """本轮对局详情，用于前端弹窗：按列 zip 组装，不做逐对 append"""
+        # 动作为整数编码（C=0 / D=1），前端可用 ACTIONS[m] 转回 Action
+        # 两侧名字列只随配对变化：按 last_pairs 缓存，δ 复用配对的轮次直接沿用
+        # （results / by_name 本身每轮新建：调用方会持有各轮的返回值）
+        if self._pair_names[0] is not self.last_pairs:
+            names = self._names
+            self._pair_names = (self.last_pairs, [names[i] for i in ii], [names[j] for j in jj])
+        _, n_i, n_j = self._pair_names
+        results = list(zip(n_i, m_i, n_j, m_j, q_i, q_j))  # [(a1.name, act1, a2.name, act2, p1, p2)]
+        by_name = dict(zip(n_i, zip(n_j, m_i, m_j, q_i)))   # {name: (opp_name, my_act, opp_act, my_payoff)}
+        by_name.update(zip(n_j, zip(n_i, m_j, m_i, q_j)))
 
         # 返回给前端的本轮信息（结构保持不变）
         return {
             "round": self.round,
             "pairs": results,
+            "by_name": by_name,
             "coop_rate": rate,
-            "round_avg_payoff": round_sum / len(self.agents),
+            "round_avg_payoff": round_avg,
         }
 
-    def summary(self) -> List[Tuple[str, int, float]]:
-        out = [(a.name, a.score, a.score / max(1, self.round)) for a in self.agents]
-        out.sort(key=lambda x: x[1], reverse=True)
-        return out
-
-    def overall_coop(self) -> float:
-        return statistics.mean(self.coop_rates) if self.coop_rates else 0.0
-
-    def _make_pairs(self):
+    def _grow(self):
+        """曲线数组容量翻倍（已写入的轮次原样拷贝）"""
+        cap = self._cap * 2
+        cumavg = np.empty((len(self.agents), cap), dtype=np.float64); cumavg[:, :self._cap] = self._cumavg
+        coop = np.empty(cap, dtype=np.float64); coop[:self._cap] = self._coop_rates
+        avg = np.empty(cap, dtype=np.float64); avg[:self._cap] = self._round_avg
+        self._cap, self._cumavg, self._coop_rates, self._round_avg = cap, cumavg, coop, avg
+
+    @property
+    def cumavg(self) -> np.ndarray:
+        """[Agent.id, 轮次] -> 截至该轮的平均收益"""
+        return self._cumavg[:, :self.round]
+
+    @property
+    def coop_rates(self) -> np.ndarray:
+        """每轮全体合作率"""
+        return self._coop_rates[:self.round]
+
+    @property
+    def per_round_avg_all(self) -> np.ndarray:
+        """每轮人均收益"""
+        return self._round_avg[:self.round]
+
+    @property
+    def action_counts(self) -> Dict[str, Dict[str, int]]:
+        """{name: {"C": 次数, "D": 次数}}；尚未开局时为空（每轮所有人都参赛，开局后人人有记录）"""
+        if not self.round:
+            return {}
+        return {a.name: {"C": c, "D": d}
+                for a, c, d in zip(self.agents, self.C_count, self.D_count)}
+
+    @property
+    def per_agent_cumavg(self) -> Dict[str, np.ndarray]:
+        """按名字取各自的累计平均曲线（cumavg 的行视图）"""
+        return {a.name: row for a, row in zip(self.agents, self.cumavg)}
+
+    def _draw_next_round(self):
         """
-        生成“本轮”的配对（不修改 self.round、不计分）。
-        逻辑：
-          1) 复制当前参赛智能体列表；
-          2) 用 self.rng 就地打乱；
-          3) 每 2 个组成一对；若数量为奇数，最后 1 个本轮轮空。
-        返回：
-          list[tuple[Agent, Agent]]，例如 [(a,b), (c,d), ...]
+        从 self.rng 抽好下一轮的均匀随机数与配对：[Agent.id] 给概率型策略，[-1] 决定是否
+        （以 δ 概率）复用上轮配对，否则就地洗牌重配；(Agent, Agent) 元组只在重配时生成一次。
+        step() 直接取用，preview_pairs() 直接读取，两者天然一致。
         """
-        # 1) 取得参赛列表（视你的实现，可能是 self.agents 或 self.pool）
-        try:
-            pool = list(self.agents)  # 大多数实现都叫 self.agents
-        except AttributeError:
-            pool = list(self.pool)  # 如果你用的是 self.pool
-
-        if not pool:
-            return []
-
-        # 2) 使用统一的 rng 打乱（兼容 random.Random / np.random.*）
-        # random.Random、RandomState、Generator 都有 .shuffle(x)
-        self.rng.shuffle(pool)
-
-        # 3) 两两成对；奇数时最后一个轮空
-        pairs = []
-        n = len(pool)
-        for i in range(0, n - 1, 2):
-            pairs.append((pool[i], pool[i + 1]))
-
-        return pairs
-
-    def preview_pairs(self):
-        """无副作用预览下一轮配对：保存 RNG 状态 → 复刻 step() 的配对逻辑 → 恢复 RNG 状态"""
-        rng = self.rng
-
-        # --- 保存 RNG 状态（按类型分支，不用 try/elif 了） ---
-        if hasattr(rng, "bit_generator"):  # numpy.Generator
-            state = rng.bit_generator.state
-            kind = "numpy"
-        elif hasattr(rng, "get_state") and hasattr(rng, "set_state"):  # numpy.RandomState
-            state = rng.get_state()
-            kind = "randomstate"
-        elif hasattr(rng, "getstate") and hasattr(rng, "setstate"):  # python random.Random
-            state = rng.getstate()
-            kind = "pyrandom"
+        u = self.rng.random(len(self._u)).tolist()
+        if self.last_pairs and u[-1] < self.delta:
+            nxt = (self.last_pairs, self._pair_i, self._pair_j)
         else:
-            raise TypeError(f"Unsupported RNG type: {type(rng)}")
+            pair_i, pair_j = _make_random_pairs(self._perm, self.rng)
+            nxt = (self._pairs_from_ids(pair_i, pair_j), pair_i, pair_j)
+        self._next_u, self._next_pairs = u, nxt
 
-        # --- 复刻 step() 的配对逻辑（包括那次 rng.random() 的消耗）---
-        if self.last_pairs and rng.random() < self.delta:
-            pairs = self.last_pairs
-        else:
-            pairs = _make_random_pairs(self.agents, rng)
+    def _pairs_from_ids(self, pair_i: List[int], pair_j: List[int]) -> List[Tuple[Agent, Agent]]:
+        agents = self.agents
+        return [(agents[i], agents[j]) for i, j in zip(pair_i, pair_j)]
 
-        # --- 恢复 RNG 状态 ---
-        if kind == "numpy":
-            rng.bit_generator.state = state
-        elif kind == "randomstate":
-            rng.set_state(state)
-        else:  # pyrandom
-            rng.setstate(state)
+    def summary(self) -> List[Tuple[str, int, float]]:
+        out = [(a.name, s, s / max(1, self.round)) for a, s in zip(self.agents, self.cumsum)]
+        out.sort(key=lambda x: x[1], reverse=True)
+        return out
+
+    def overall_coop(self) -> float:
+        return float(self.coop_rates.mean()) if self.round else 0.0
 
-        return pairs
+    def preview_pairs(self) -> List[Tuple[Agent, Agent]]:
+        """无副作用预览下一轮配对：下一轮的配对已由 _draw_next_round 抽好，直接返回"""
+        return self._next_pairs[0]
 
 # ========== 工厂：构建19个固定策略 + USER ==========
 